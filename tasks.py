@@ -2,27 +2,54 @@
 #
 # SPDX-License-Identifier: MIT OR Apache-2.0
 
+import fnmatch
+import functools
 import glob
+import hashlib
+import inspect
 import json
+import logging
+import os
 import platform
+import shlex
 import shutil
+import struct
+import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
-import fitz
-import fitz.utils
-from invoke.exceptions import UnexpectedExit
+from invoke.exceptions import Exit
 from invoke.tasks import task
-from reportlab.graphics import renderPDF
-from svglib import svglib
 
-if sys.version_info >= (3, 11):
-    import inspect
+try:
+    import resvg_py
+except ImportError:
+    resvg_py = None
 
-    if not hasattr(inspect, "getargspec"):
-        inspect.getargspec = inspect.getfullargspec
+log = logging.getLogger("tasks")
 
 
+@functools.cache
+def _configure_logging():
+    """Log progress messages to stdout, along with kicad-cli's own output."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    # Don't also pass the messages to the root logger, which belongs to the
+    # caller (and to invoke, which configures it when run with --debug)
+    log.propagate = False
+    # Run invoke with --debug to also log each kicad-cli command
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        log.setLevel(logging.INFO)
+
+
+@functools.cache
 def get_kicad_cli_path() -> Path:
     """Determine the KiCad CLI path based on the operating system."""
     if platform.system() == "Darwin":  # macOS
@@ -47,6 +74,11 @@ def get_kicad_cli_path() -> Path:
     return Path("kicad-cli")
 
 
+def kicad_cli() -> str:
+    """Return the KiCad CLI command, resolving it on first use."""
+    return str(get_kicad_cli_path())
+
+
 def get_kicad_project_path() -> Path:
     """
     Searches the current directory for exactly one .kicad_pro file.
@@ -89,11 +121,10 @@ def extract_text_variables(kicad_pro_path: Path) -> dict[str, str]:
         return data.get("text_variables", None)
 
     except (json.JSONDecodeError, FileNotFoundError) as e:
-        print(f"Error reading file: {e}")
+        log.error("Error reading file: %s", e)
         return {}
 
 
-KICAD_CLI = str(get_kicad_cli_path())
 PROJECT_PATH = get_kicad_project_path()
 text_variables = extract_text_variables(PROJECT_PATH)
 
@@ -111,49 +142,184 @@ PCB_REV = text_variables.get("PCB_REV", "0")
 SCH_PATH = Path(f"{PROJECT_NAME}.kicad_sch")
 PCB_PATH = Path(f"{PROJECT_NAME}.kicad_pcb")
 
+
 # Project Output Path
-OUTPUT_PATH = Path(f"output/{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}")
+@functools.cache
+def get_output_path() -> Path:
+    """Return the project output directory."""
+    return Path(f"output/{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}")
+
 
 # Report Output Paths
-REPORT_OUTPUT_PATH = OUTPUT_PATH / Path("Reports")
-ERC_REPORT_PATH = REPORT_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_ERC_report.txt"
-)
-DRC_REPORT_PATH = REPORT_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_DRC_report.txt"
-)
+@functools.cache
+def get_report_output_path() -> Path:
+    """Return the report output directory."""
+    return get_output_path() / Path("Reports")
+
+
+@functools.cache
+def get_erc_report_path() -> Path:
+    """Return the ERC report path."""
+    return get_report_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_ERC_report.txt"
+    )
+
+
+@functools.cache
+def get_drc_report_path() -> Path:
+    """Return the DRC report path."""
+    return get_report_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_DRC_report.txt"
+    )
+
 
 # PCA Output Paths
-PCA_OUTPUT_PATH = OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}"
-)
-SCH_OUTPUT_PATH = PCA_OUTPUT_PATH / Path("Schematic")
-BOM_OUTPUT_PATH = PCA_OUTPUT_PATH / Path("BOM")
-SCH_PDF_PATH = SCH_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}.pdf"
-)
-SCH_SVG_PATH = SCH_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}_SVG"
-)
-SCH_PNG_PATH = SCH_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}.png"
-)
-BOM_PATH = BOM_OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_ECAD_BOM_{PCA_PART_NUMBER}_Rev_{PCA_REV}.csv"
-)
-PCA_RENDER_PATH = PCA_OUTPUT_PATH / Path("Renders")
+@functools.cache
+def get_pca_output_path() -> Path:
+    """Return the PCA output directory."""
+    return get_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}"
+    )
+
+
+@functools.cache
+def get_sch_output_path() -> Path:
+    """Return the schematic output directory."""
+    return get_pca_output_path() / Path("Schematic")
+
+
+@functools.cache
+def get_bom_output_path() -> Path:
+    """Return the BOM output directory."""
+    return get_pca_output_path() / Path("BOM")
+
+
+@functools.cache
+def get_sch_pdf_path() -> Path:
+    """Return the schematic PDF path."""
+    return get_sch_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}.pdf"
+    )
+
+
+@functools.cache
+def get_sch_svg_path() -> Path:
+    """Return the schematic SVG output directory."""
+    return get_sch_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}_SVG"
+    )
+
+
+@functools.cache
+def get_sch_png_path() -> Path:
+    """Return the schematic PNG path."""
+    return get_sch_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_Schematic_{SCH_PART_NUMBER}_Rev_{SCH_REV}.png"
+    )
+
+
+@functools.cache
+def get_bom_path() -> Path:
+    """Return the assembly BOM path."""
+    return get_bom_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_ECAD_BOM_{PCA_PART_NUMBER}_Rev_{PCA_REV}.csv"
+    )
+
+
+@functools.cache
+def get_pca_render_path() -> Path:
+    """Return the PCA render output directory."""
+    return get_pca_output_path() / Path("Renders")
+
 
 # PCB Output Paths
-PCB_OUTPUT_PATH = OUTPUT_PATH / Path(
-    f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCB_{PCB_PART_NUMBER}_Rev_{PCB_REV}"
+@functools.cache
+def get_pcb_output_path() -> Path:
+    """Return the PCB output directory."""
+    return get_output_path() / Path(
+        f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCB_{PCB_PART_NUMBER}_Rev_{PCB_REV}"
+    )
+
+
+@functools.cache
+def get_gerbers_path() -> Path:
+    """Return the Gerber output directory."""
+    return get_pcb_output_path() / Path("Gerbers")
+
+
+@functools.cache
+def get_odb_path() -> Path:
+    """Return the ODB++ archive path."""
+    return get_pcb_output_path() / Path("ODB++") / Path(f"{PROJECT_NAME}.zip")
+
+
+@functools.cache
+def get_pcb_pdf_path() -> Path:
+    """Return the PCB PDF output directory."""
+    return get_pcb_output_path() / Path("PDF")
+
+
+@functools.cache
+def get_drill_files_path() -> Path:
+    """Return the drill file output directory."""
+    return get_pcb_output_path() / Path("Drill_Files")
+
+
+@functools.cache
+def get_ipcd356_path() -> Path:
+    """Return the IPC-D-356 netlist path."""
+    return (
+        get_pcb_output_path() / Path("Netlist") / Path(f"{PROJECT_NAME}.d356")
+    )
+
+
+@functools.cache
+def get_position_path() -> Path:
+    """Return the position file path."""
+    return (
+        get_pcb_output_path() / Path("Position") / Path(f"{PROJECT_NAME}.pos")
+    )
+
+
+@functools.cache
+def get_pcb_render_path() -> Path:
+    """Return the PCB render output directory."""
+    return get_output_path() / Path("Renders")
+
+
+# Release Layers
+#
+# Currently need to use the built-in layer names:
+# https://gitlab.com/kicad/code/kicad/-/issues/20904
+GERBER_LAYERS = "F.Cu,B.Cu,F.Paste,B.Paste,F.Silkscreen,B.Silkscreen,F.Mask,B.Mask,User.Drawings,User.Comments,Edge.Cuts,F.Fab,B.Fab,User.1,User.2"
+PCB_PDF_FRONT_LAYERS = "F.Cu,F.Paste,F.Silkscreen,F.Mask,User.Drawings,User.Comments,Edge.Cuts,F.Fab,User.1"
+PCB_PDF_BACK_LAYERS = "B.Cu,B.Paste,B.Silkscreen,B.Mask,B.Fab,User.2"
+
+# Fixed kicad-cli arguments for the PCB exports, built once at import
+_GERBERS_ARGV_PREFIX = (
+    "pcb",
+    "export",
+    "gerbers",
+    "--exclude-value",
+    "--use-drill-file-origin",
+    "--no-protel-ext",
 )
-GERBERS_PATH = PCB_OUTPUT_PATH / Path("Gerbers")
-ODB_PATH = PCB_OUTPUT_PATH / Path("ODB++") / Path(f"{PROJECT_NAME}.zip")
-PCB_PDF_PATH = PCB_OUTPUT_PATH / Path("PDF")
-DRILL_FILES_PATH = PCB_OUTPUT_PATH / Path("Drill_Files")
-IPCD356_PATH = PCB_OUTPUT_PATH / Path("Netlist") / Path(f"{PROJECT_NAME}.d356")
-POSITION_PATH = PCB_OUTPUT_PATH / Path("Position") / Path(f"{PROJECT_NAME}.pos")
-PCB_RENDER_PATH = OUTPUT_PATH / Path("Renders")
+_PCB_PDF_ARGV_PREFIX = (
+    "pcb",
+    "export",
+    "pdf",
+    "--exclude-value",
+    "--include-border-title",
+    "--common-layers=Edge.Cuts",
+    "--drill-shape-opt=0",
+)
+
+
+# Export Cache Path
+@functools.cache
+def get_export_cache_path() -> Path:
+    """Return the export cache path."""
+    return get_output_path() / Path(".cache.json")
 
 
 def rm(
@@ -174,22 +340,36 @@ def rm(
     """
     path = Path(path)
 
-    paths = path.parent.glob(path.name) if use_glob else [path]
+    if use_glob:
+        # Match the pattern against a single directory scan. The DirEntry
+        # objects cache the file type, so checking it below doesn't need
+        # another stat() per match.
+        try:
+            with os.scandir(path.parent) as it:
+                paths = [
+                    entry
+                    for entry in it
+                    if fnmatch.fnmatchcase(entry.name, path.name)
+                ]
+        except FileNotFoundError:
+            paths = []
+    else:
+        paths = [path]
 
     for p in paths:
         try:
             if p.is_symlink() or p.is_file():
-                p.unlink(missing_ok=force)
+                os.unlink(p)
             elif p.is_dir():
                 if recursive:
                     shutil.rmtree(p, ignore_errors=force)
                 else:
                     raise IsADirectoryError(
-                        f"Cannot remove directory '{p}' without recursive=True"
+                        f"Cannot remove directory '{os.fspath(p)}' without recursive=True"
                     )
             else:
                 if not force:
-                    raise OSError(f"Unknown file type: '{p}'")
+                    raise OSError(f"Unknown file type: '{os.fspath(p)}'")
         except FileNotFoundError:
             if not force:
                 raise
@@ -198,254 +378,701 @@ def rm(
                 raise e
 
 
+def _rmtree_parallel(root: str | Path) -> None:
+    """
+    Remove a directory tree, deleting its top-level entries in parallel.
+
+    Errors are ignored, like `rm -rf`.
+    """
+
+    def remove(entry: os.DirEntry) -> None:
+        # DirEntry caches the file type from the directory scan, so this
+        # doesn't need another stat() per entry.
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    with os.scandir(root) as it:
+        entries = list(it)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in executor.map(remove, entries):
+            pass
+
+    # Remove whatever is left, which is normally just the now empty root
+    shutil.rmtree(root, ignore_errors=True)
+
+
+# Directories already created by ensure_dir() in this process
+_ensured: set[Path] = set()
+
+
 def ensure_dir(path):
     """Ensure the directory exists for a given path."""
     if isinstance(path, str):
         path = Path(path)
-    path.parent.resolve().mkdir(parents=True, exist_ok=True)
+    parent = path.parent
+    if parent in _ensured:
+        return
+    parent.mkdir(parents=True, exist_ok=True)
+    _ensured.add(parent)
 
 
-def svg_to_png(svg_path, png_path, scale=None, dpi=None, alpha=False):
-    """Convert a SVG file to a PNG file."""
-    # I wanted to avoid dependencies that dynamically link to external (i.e.
-    # non-python) system libs like cairo, but renderPM does not support
-    # transparency when rendering to PNG. The solution used below converts the
-    # SVG to PDF with svglib+reportlab, then opens the PDF with fitz (pyMuPdf)
-    # and saves it as PNG.
-    #
-    # The code below is derived from this svglib comment:
-    # https://github.com/deeplook/svglib/issues/171#issuecomment-1287829712
+@functools.cache
+def _hash_file(path: str, mtime_ns: int, size: int) -> str:
+    """Return the BLAKE2b hash of a file's contents."""
+    # The modification time and size are only part of the memoization key, so
+    # a file that changes during a run (e.g. the schematic SVG) is rehashed.
+    return hashlib.blake2b(Path(path).read_bytes()).hexdigest()
+
 
-    print(f"Generating {png_path} from {svg_path}...")
+def file_hash(path: str | Path) -> str:
+    """Return the BLAKE2b hash of a file's contents."""
+    stat = os.stat(path)
+    return _hash_file(str(path), stat.st_mtime_ns, stat.st_size)
 
-    if scale is not None and dpi is not None:
-        raise ValueError("Cannot specify both scale and dpi")
 
-    # Convert the SVG file to RLG drawing object
-    drawing = svglib.svg2rlg(svg_path)
-    if drawing is None:
-        raise ValueError(f"Failed to convert {svg_path} to ReportLab drawing")
+# Export cache, mapping a hash of each export call to the hash of its inputs
+# and the files in its output directories from the last successful run.
+# Loaded from get_export_cache_path() on first use.
+_export_cache: dict[str, dict] | None = None
+_export_cache_lock = threading.Lock()
+_export_state = threading.local()
 
-    # If scale is specified, scale the width or height (whichever is larger) to
-    # match the scale in pixels, preserving the aspect ratio. If dpi is
-    # specified, the drawing will be scaled to the specified dpi.
-    if scale is not None:
-        max_dimension = max(drawing.width, drawing.height)
-        scale_factor = scale / max_dimension
-        drawing.width *= scale_factor
-        drawing.height *= scale_factor
-        drawing.renderScale = scale_factor
 
-    # Render the RLG drawing object to PDF in memory
-    pdf = renderPDF.drawToString(drawing)
+def _load_export_cache() -> dict[str, dict]:
+    """Return the export cache, loading it the first time it's needed."""
+    global _export_cache
+    if _export_cache is None:
+        try:
+            with open(get_export_cache_path(), "r", encoding="utf-8") as f:
+                _export_cache = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            _export_cache = {}
+    return _export_cache
 
-    # Open the PDF with fitz (pyMuPdf) and save it as a PNG file
-    doc = fitz.Document(stream=pdf)
-    page = doc.load_page(0)
-    pixmap = fitz.utils.get_pixmap(page, alpha=alpha, dpi=dpi)
-    ensure_dir(png_path)
-    pixmap.save(png_path)
 
+def _save_export_cache() -> None:
+    """Write the export cache back to get_export_cache_path()."""
+    cache_path = get_export_cache_path()
+    ensure_dir(cache_path)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_export_cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
 
-def kicad_version(context):
-    """Print the KiCad version."""
-    cmd = " ".join(
+
+# Hash of tasks.py and the kicad-cli version, computed on first use. The
+# first use is in the release workers, so the lock makes sure only one of them
+# runs `kicad-cli version`.
+_export_environment: str | None = None
+_export_environment_lock = threading.Lock()
+
+
+def _export_environment_hash() -> str:
+    """
+    Return a hash of what determines export outputs besides their arguments.
+
+    This covers tasks.py itself (so changing a hard-coded kicad-cli flag
+    invalidates the cache) and the kicad-cli version.
+    """
+    global _export_environment
+    with _export_environment_lock:
+        if _export_environment is None:
+            try:
+                version = subprocess.run(
+                    [kicad_cli(), "version"],
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+            except FileNotFoundError:
+                # The export itself will report the missing kicad-cli
+                version = ""
+            _export_environment = hashlib.blake2b(
+                Path(__file__).read_bytes() + version.encode()
+            ).hexdigest()
+        return _export_environment
+
+
+def _output_files(output_paths) -> list[str]:
+    """List the files in the directories among an export's output paths."""
+    files = []
+    for path in map(Path, output_paths):
+        if path.is_dir():
+            files += sorted(str(p) for p in path.rglob("*") if p.is_file())
+    return files
+
+
+def _cache_key_default(obj):
+    """Serialize export arguments that json can't handle natively."""
+    if callable(obj):
+        return obj.__qualname__
+    return str(obj)
+
+
+def cached_export(inputs, outputs):
+    """
+    Skip an export if nothing has changed since its last successful run.
+
+    The export is skipped if all of its outputs exist (including every file
+    that was in an output directory after the last run), it's called with the
+    same arguments as before, tasks.py and the kicad-cli version are
+    unchanged, and the contents of its input files (plus the KiCad project
+    file) are unchanged.
+
+    Only the files named by the arguments are hashed, i.e. the top-level
+    .kicad_sch and the .kicad_pcb. Hierarchical sub-sheets, library tables,
+    libraries and drawing sheets are not tracked, so run `inv clean` to force
+    a full rebuild after changing any of those.
+
+    Args:
+        inputs: Names of the arguments holding input file paths. Names that
+            aren't passed to the export are ignored.
+        outputs: Names of the arguments holding output paths, or a callable
+            that returns the output paths given the export's arguments.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Exports called from inside another cached export (e.g. by
+            # export_zipped) are covered by the outer export's cache entry.
+            if getattr(_export_state, "active", False):
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            # A dry run doesn't produce any outputs, so don't record it
+            context = bound.arguments.get("context")
+            if context is not None and context.config.run.dry:
+                return func(*args, **kwargs)
+
+            arguments = {}
+            for name, value in bound.arguments.items():
+                parameter = signature.parameters[name]
+                if parameter.kind is inspect.Parameter.VAR_KEYWORD:
+                    arguments.update(value)
+                elif name != "context":
+                    arguments[name] = value
+
+            if callable(outputs):
+                output_paths = outputs(arguments)
+            else:
+                output_paths = [arguments[name] for name in outputs]
+            input_paths = [
+                arguments[name] for name in inputs if name in arguments
+            ]
+            input_paths.append(PROJECT_PATH)
+
+            key = hashlib.blake2b(
+                json.dumps(
+                    [func.__qualname__, arguments, _export_environment_hash()],
+                    sort_keys=True,
+                    default=_cache_key_default,
+                ).encode()
+            ).hexdigest()
+            try:
+                input_hash = hashlib.blake2b(
+                    "".join(file_hash(path) for path in input_paths).encode()
+                ).hexdigest()
+            except FileNotFoundError:
+                # Let the export itself deal with the missing input
+                input_hash = None
+
+            with _export_cache_lock:
+                cache = _load_export_cache()
+                entry = cache.get(key)
+            if (
+                input_hash is not None
+                and isinstance(entry, dict)
+                and entry.get("inputs") == input_hash
+                and all(
+                    Path(p).exists()
+                    for p in [*output_paths, *entry.get("files", [])]
+                )
+            ):
+                log.info("Skipping %s, outputs are up to date", func.__name__)
+                return None
+
+            _export_state.active = True
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                _export_state.active = False
+
+            if input_hash is None:
+                return result
+            # The front and back PCB PDFs share an output directory, so this
+            # may also list files from the other export. That only means
+            # deleting one of them reruns both.
+            files = _output_files(output_paths)
+            with _export_cache_lock:
+                cache[key] = dict(inputs=input_hash, files=files)
+                _save_export_cache()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def zip_dir(src_dir, zip_path, compresslevel=6):
+    """Write the contents of a directory to a zip archive."""
+    src_dir = Path(src_dir)
+    ensure_dir(zip_path)
+    with zipfile.ZipFile(
+        zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+    ) as zf:
+        # ZipFile.write() adds a directory entry for directories
+        for path in sorted(src_dir.rglob("*")):
+            zf.write(path, path.relative_to(src_dir))
+
+
+def parallel_archive(src_dir, archive_path, archive_format="zip"):
+    """
+    Compress the contents of a directory as fast as possible.
+
+    Args:
+        src_dir: Directory to compress.
+        archive_path: Path of the archive to write.
+        archive_format: "zip" writes a zip archive at the fastest deflate
+            level. "tgz" writes a gzipped tar archive, compressed on all cores
+            with pigz if it's installed.
+    """
+    if archive_format == "zip":
+        zip_dir(src_dir, archive_path, compresslevel=1)
+        return
+    if archive_format != "tgz":
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+
+    ensure_dir(archive_path)
+    if not shutil.which("pigz"):
+        log.info("pigz not found, compressing %s on one core", archive_path)
+        with tarfile.open(archive_path, "w:gz", compresslevel=1) as tar:
+            tar.add(src_dir, arcname=".")
+        return
+
+    with open(archive_path, "wb") as f:
+        tar = subprocess.Popen(
+            ["tar", "-cf", "-", "-C", str(src_dir), "."],
+            stdout=subprocess.PIPE,
+        )
+        pigz = subprocess.Popen(["pigz", "-1"], stdin=tar.stdout, stdout=f)
+        # Let tar receive SIGPIPE if pigz exits early
+        tar.stdout.close()
+        pigz_returncode = pigz.wait()
+        tar_returncode = tar.wait()
+    if tar_returncode or pigz_returncode:
+        raise OSError(f"Failed to compress {src_dir} to {archive_path}")
+
+
+@cached_export(inputs=("schematic_path", "pcb_path"), outputs=("zip_path",))
+def export_zipped(context, export, zip_path, output_arg, **kwargs):
+    """
+    Run an export into a temporary directory and zip the result.
+
+    Args:
+        context: The invoke context.
+        export: The export function to run (e.g. pcb_export_gerbers).
+        zip_path: Path to the zip archive to create.
+        output_arg: Name of the export function's output directory argument.
+        **kwargs: Any other arguments for the export function.
+    """
+    if context.config.run.dry:
+        # Only echo the export; there's nothing to zip
+        export(
+            context, **{output_arg: Path(zip_path).with_suffix("")}, **kwargs
+        )
+        return
+
+    # The temporary directory is created next to the zip archive so the
+    # export and the archive are on the same filesystem.
+    ensure_dir(zip_path)
+    with tempfile.TemporaryDirectory(dir=Path(zip_path).parent) as tmpdir:
+        export(context, **{output_arg: Path(tmpdir)}, **kwargs)
+        zip_dir(tmpdir, zip_path)
+
+
+def svg_to_png(
+    svg_path, png_path, scale=None, dpi=None, alpha=False, grayscale=False
+):
+    """Convert a SVG file to a PNG file."""
+    svg_to_pngs(
+        svg_path,
         [
-            KICAD_CLI,
-            "version",
-            "--format=about",
-        ]
+            dict(
+                png_path=png_path,
+                scale=scale,
+                dpi=dpi,
+                alpha=alpha,
+                grayscale=grayscale,
+            )
+        ],
     )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: KiCad version check failed with an unexpected exit code ({e.result.exited})"
+
+
+@cached_export(
+    inputs=("svg_path",),
+    outputs=lambda arguments: [o["png_path"] for o in arguments["outputs"]],
+)
+def svg_to_pngs(svg_path, outputs):
+    """
+    Convert a SVG file to one or more PNG files.
+
+    The SVG file is only read once, no matter how many outputs are requested.
+    With resvg, it's still parsed and rendered once per output.
+
+    Args:
+        svg_path: Path to the SVG file.
+        outputs: A list of dicts, one per PNG file, with a 'png_path' key and
+            optional 'scale', 'dpi', 'alpha' and 'grayscale' keys (as for
+            svg_to_png). Use grayscale for black and white SVGs to write
+            1 byte per pixel instead of 3. It only applies when falling back
+            to fitz: resvg always renders RGBA, and converting its render
+            would cost more time than the smaller PNG saves, so the option is
+            ignored there.
+    """
+    for output in outputs:
+        if output.get("scale") is not None and output.get("dpi") is not None:
+            raise ValueError("Cannot specify both scale and dpi")
+
+    if resvg_py is None:
+        _svg_to_pngs_via_fitz(svg_path, outputs)
+        return
+
+    # resvg rasterizes the SVG directly to PNG (with native transparency
+    # support), so there's no need to round-trip through a PDF. It ships as a
+    # self-contained wheel, so it doesn't pull in any non-python system libs.
+    #
+    # resvg is fast enough that rendering each output at its own size is
+    # cheaper than decoding and downscaling a larger render, so only the file
+    # read is shared between outputs.
+    svg = Path(svg_path).read_text(encoding="utf-8")
+    for output in outputs:
+        png_path = output["png_path"]
+        scale = output.get("scale")
+        log.info("Generating %s from %s...", png_path, svg_path)
+
+        # If scale is specified, the width or height (whichever is larger) is
+        # scaled to match the scale in pixels, preserving the aspect ratio. If
+        # dpi is specified, the drawing will be scaled to the specified dpi.
+        png = resvg_py.svg_to_bytes(
+            svg_string=svg,
+            resources_dir=str(Path(svg_path).parent),
+            width=scale,
+            height=scale,
+            dpi=output.get("dpi") or 72,
+            background=None if output.get("alpha", False) else "#ffffff",
         )
-        raise
+        if output.get("dpi") is not None:
+            png = _png_set_dpi(png, output["dpi"])
+        ensure_dir(png_path)
+        Path(png_path).write_bytes(png)
 
 
-def schematic_erc(context, schematic_path, report_path):
-    """Run ERC on the schematic."""
-    print(f"Running ERC on the schematic...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "sch",
-            "erc",
-            f"--output={report_path}",
-            "--severity-warning",
-            "--severity-error",
-            "--exit-code-violations",
-            f"{schematic_path}",
-        ]
+def _png_set_dpi(png, dpi):
+    """
+    Return the PNG data with its resolution metadata set to dpi.
+
+    resvg doesn't write a pHYs chunk, so viewers would assume 96 dpi. The
+    chunk is inserted right after IHDR rather than re-encoding the image.
+    """
+    ppm = round(dpi / 0.0254)
+    data = b"pHYs" + struct.pack(">IIB", ppm, ppm, 1)
+    chunk = (
+        struct.pack(">I", len(data) - 4)
+        + data
+        + struct.pack(">I", zlib.crc32(data))
     )
+    # 8 byte signature + 4 byte length + 4 byte type + 13 byte data + 4 byte
+    # CRC
+    ihdr_end = 33
+    return bytes(png[:ihdr_end]) + chunk + bytes(png[ihdr_end:])
+
+
+def _svg_to_pngs_via_fitz(svg_path, outputs):
+    """Convert a SVG file to PNG files with fitz (pyMuPdf)."""
+    # Fallback used when resvg is not installed. fitz can open SVG files
+    # directly, so this avoids depending on svglib+reportlab just to convert
+    # the SVG to an intermediate PDF.
+    import fitz
+
+    # The page is vector data, so each output is rendered at its final size
+    # rather than downscaled from a larger render.
     try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        if e.result.exited == 5:
-            print(f"\nERROR: ERC violations found in the schematic.")
-            print(f"Check {report_path} for details.")
+        with fitz.open(str(svg_path)) as doc:
+            page = doc.load_page(0)
+            for output in outputs:
+                png_path = output["png_path"]
+                scale = output.get("scale")
+                dpi = output.get("dpi")
+                alpha = output.get("alpha", False)
+                grayscale = output.get("grayscale", False)
+                log.info("Generating %s from %s...", png_path, svg_path)
+
+                # If scale is specified, scale the width or height (whichever
+                # is larger) to match the scale in pixels, preserving the
+                # aspect ratio. If dpi is specified, the drawing will be
+                # scaled to the specified dpi.
+                if scale is not None:
+                    zoom = scale / max(page.rect.width, page.rect.height)
+                else:
+                    zoom = (dpi or 72) / 72
+                # The page comes from a SVG and has no annotations, so skip
+                # rendering them
+                pixmap = page.get_pixmap(
+                    matrix=fitz.Matrix(zoom, zoom),
+                    colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+                    alpha=alpha,
+                    annots=False,
+                )
+                if dpi is not None:
+                    pixmap.set_dpi(dpi, dpi)
+                ensure_dir(png_path)
+                pixmap.save(png_path)
+    finally:
+        # Drop MuPDF's internal cache, otherwise PyMuPDF holds on to that
+        # memory until the process exits
+        fitz.TOOLS.store_shrink(100)
+
+
+def _run_kicad(context, argv, *, error, on_exit_code=None):
+    """
+    Run a kicad-cli command without going through a shell.
+
+    Honors invoke's run.echo and run.dry settings (e.g. `inv --echo` and
+    `inv --dry`), like context.run() would.
+
+    Args:
+        context: The invoke context.
+        argv: The full kicad-cli command as a list of arguments.
+        error: Description of the command used in the error message if it
+            fails (e.g. "PDF export from the schematic").
+        on_exit_code: Optional mapping of known exit codes to error messages.
+
+    Raises:
+        Exit: If the command fails, so invoke can exit cleanly with the same
+            exit code.
+    """
+    # Every command is a separate kicad-cli process. KiCad 9's `kicad-cli
+    # jobset run` could run all the release outputs in a single process and
+    # save the repeated startup cost, but it runs the jobs one after another
+    # from a .kicad_jobset file. Separate processes let release run the
+    # exports concurrently, keep the export options in this file, and let each
+    # export be cached and skipped on its own.
+    # kicad-cli never reads from stdin, so don't forward it. This also keeps
+    # concurrent invocations from competing for the terminal.
+    dry = context.config.run.dry
+    if dry or context.config.run.echo:
+        log.info(shlex.join(argv))
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug(shlex.join(argv))
+    if dry:
+        return
+
+    try:
+        subprocess.run(argv, stdin=subprocess.DEVNULL, check=True)
+    except FileNotFoundError as e:
+        log.error("\nERROR: %s not found", argv[0])
+        raise Exit(code=127) from e
+    except subprocess.CalledProcessError as e:
+        if on_exit_code and e.returncode in on_exit_code:
+            log.error("\nERROR: %s", on_exit_code[e.returncode])
         else:
-            # This should not happen unless the KiCad CLI adds additional error
-            # return codes in the future.
-            print(
-                f"\nERROR: ERC failed with an unexpected exit code ({e.result.exited})"
+            # This should not happen unless the KiCad CLI adds additional
+            # error return codes in the future.
+            log.error(
+                "\nERROR: %s failed with an unexpected exit code (%d)",
+                error,
+                e.returncode,
             )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+        raise Exit(code=e.returncode) from e
+
+
+def kicad_version(context):
+    """Print the KiCad version."""
+    argv = [
+        kicad_cli(),
+        "version",
+        "--format=about",
+    ]
+    _run_kicad(context, argv, error="KiCad version check")
 
 
+def schematic_erc(context, schematic_path, report_path):
+    """Run ERC on the schematic."""
+    log.info("Running ERC on the schematic...")
+    argv = [
+        kicad_cli(),
+        "sch",
+        "erc",
+        f"--output={report_path}",
+        "--severity-warning",
+        "--severity-error",
+        "--exit-code-violations",
+        f"{schematic_path}",
+    ]
+    _run_kicad(
+        context,
+        argv,
+        error="ERC",
+        on_exit_code={
+            5: f"ERC violations found in the schematic.\nCheck {report_path} for details.",
+        },
+    )
+
+
+@cached_export(inputs=("schematic_path",), outputs=("pdf_path",))
 def schematic_export_pdf(context, schematic_path, pdf_path):
     """Export PDF from the schematic."""
-    print("Exporting Schematic PDF...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "sch",
-            "export",
-            "pdf",
-            f'--output="{pdf_path}"',
-            "--black-and-white",
-            "--no-background-color",
-            f'"{schematic_path}"',
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: PDF export from the schematic failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting Schematic PDF...")
+    argv = [
+        kicad_cli(),
+        "sch",
+        "export",
+        "pdf",
+        f"--output={pdf_path}",
+        "--black-and-white",
+        "--no-background-color",
+        f"{schematic_path}",
+    ]
+    _run_kicad(context, argv, error="PDF export from the schematic")
 
 
+@cached_export(inputs=("schematic_path",), outputs=("svg_path",))
 def schematic_export_svg(context, schematic_path, svg_path):
     """Export SVG from the schematic."""
-    print("Exporting Schematic SVG...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "sch",
-            "export",
-            "svg",
-            f'--output="{svg_path}"',
-            "--black-and-white",
-            "--no-background-color",
-            f'"{schematic_path}"',
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: SVG export from the schematic failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting Schematic SVG...")
+    argv = [
+        kicad_cli(),
+        "sch",
+        "export",
+        "svg",
+        f"--output={svg_path}",
+        "--black-and-white",
+        "--no-background-color",
+        f"{schematic_path}",
+    ]
+    _run_kicad(context, argv, error="SVG export from the schematic")
 
 
+@cached_export(inputs=("schematic_path",), outputs=("bom_path",))
 def schematic_export_bom(context, schematic_path, bom_path):
     """Export assembly BOM from the schematic."""
-    print("Exporting assembly BOM...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "sch",
-            "export",
-            "bom",
-            f'--output="{bom_path}"',
-            '--preset="Common Ground Electronics BOM"',
-            '--format-preset="CSV"',
-            f'"{schematic_path}"',
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: BOM export from the schematic failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting assembly BOM...")
+    argv = [
+        kicad_cli(),
+        "sch",
+        "export",
+        "bom",
+        f"--output={bom_path}",
+        "--preset=Common Ground Electronics BOM",
+        "--format-preset=CSV",
+        f"{schematic_path}",
+    ]
+    _run_kicad(context, argv, error="BOM export from the schematic")
 
 
 def pcb_drc(context, pcb_path, report_path):
     """Run DRC on the PCB."""
-    print(f"Running DRC on the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "pcb",
-            "drc",
-            f"--output={report_path}",
-            "--schematic-parity",
-            "--severity-warning",
-            "--severity-error",
-            "--exit-code-violations",
-            f"{pcb_path}",
-        ]
+    log.info("Running DRC on the PCB...")
+    argv = [
+        kicad_cli(),
+        "pcb",
+        "drc",
+        f"--output={report_path}",
+        "--schematic-parity",
+        "--severity-warning",
+        "--severity-error",
+        "--exit-code-violations",
+        f"{pcb_path}",
+    ]
+    _run_kicad(
+        context,
+        argv,
+        error="DRC",
+        on_exit_code={
+            5: f"DRC violations found in the PCB.\nCheck {report_path} for details.",
+        },
     )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        if e.result.exited == 5:
-            print(f"\nERROR: DRC violations found in the PCB.")
-            print(f"Check {report_path} for details.")
-        else:
-            # This should not happen unless the KiCad CLI adds additional error
-            # return codes in the future.
-            print(
-                f"\nERROR: DRC failed with an unexpected exit code ({e.result.exited})"
-            )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
 
 
+@cached_export(inputs=("pcb_path",), outputs=("gerbers_path",))
 def pcb_export_gerbers(context, pcb_path, gerbers_path, layers):
     """Export Gerbers from the PCB."""
-    print(f"Exporting Gerbers from the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
+    log.info("Exporting Gerbers from the PCB...")
+    argv = [
+        kicad_cli(),
+        *_GERBERS_ARGV_PREFIX,
+        f"--output={gerbers_path}",
+        f"--layers={layers}",
+        f"{pcb_path}",
+    ]
+    _run_kicad(context, argv, error="Gerber export from the PCB")
+
+
+@cached_export(inputs=("pcb_path",), outputs=("odb_path",))
+def pcb_export_odb(context, pcb_path, odb_path, archive_format=None):
+    """
+    Export ODB++ from the PCB.
+
+    If archive_format is given ("zip" or "tgz", see parallel_archive()),
+    kicad-cli exports the ODB++ data uncompressed and parallel_archive()
+    compresses it to odb_path instead of kicad-cli's single-threaded zip
+    compression. odb_path's suffix should match the format.
+    """
+    log.info("Exporting ODB++ from the PCB...")
+    if archive_format is None:
+        argv = [
+            kicad_cli(),
+            "pcb",
+            "export",
+            "odb",
+            f"--output={odb_path}",
+            f"{pcb_path}",
+        ]
+        _run_kicad(context, argv, error="ODB++ export from the PCB")
+        return
+
+    odb_path = Path(odb_path)
+    if context.config.run.dry:
+        # Only echo the export; there's nothing to compress
+        argv = [
+            kicad_cli(),
             "pcb",
             "export",
-            "gerbers",
-            f"--output={gerbers_path}",
-            f"--layers={layers}",
-            "--exclude-value",
-            "--use-drill-file-origin",
-            "--no-protel-ext",
+            "odb",
+            f"--output={odb_path.with_suffix('')}",
+            "--compression=none",
             f"{pcb_path}",
         ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: Gerber export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+        _run_kicad(context, argv, error="ODB++ export from the PCB")
+        return
 
-
-def pcb_export_odb(context, pcb_path, odb_path):
-    """Export ODB++ from the PCB."""
-    print(f"Exporting ODB++ from the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
+    ensure_dir(odb_path)
+    with tempfile.TemporaryDirectory(dir=odb_path.parent) as tmpdir:
+        argv = [
+            kicad_cli(),
             "pcb",
             "export",
             "odb",
-            f"--output={odb_path}",
+            f"--output={Path(tmpdir) / odb_path.stem}",
+            "--compression=none",
             f"{pcb_path}",
         ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: Gerber export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+        _run_kicad(context, argv, error="ODB++ export from the PCB")
+        parallel_archive(tmpdir, odb_path, archive_format)
 
 
+@cached_export(inputs=("pcb_path",), outputs=("pdf_path",))
 def pcb_export_pdf(
     context,
     pcb_path,
@@ -456,117 +1083,84 @@ def pcb_export_pdf(
     black_and_white=True,
 ):
     """Export PDF from the PCB."""
-    print(f"Exporting PDF from the PCB...")
-    cmd_list = [
-        KICAD_CLI,
-        "pcb",
-        "export",
-        "pdf",
+    log.info("Exporting PDF from the PCB...")
+    argv = [
+        kicad_cli(),
+        *_PCB_PDF_ARGV_PREFIX,
         f"--output={pdf_path}",
         f"--layers={layers}",
-        "--exclude-value",
-        "--include-border-title",
-        "--common-layers=Edge.Cuts",
-        "--drill-shape-opt=0",
         f"{pcb_path}",
     ]
     if mirror:
-        cmd_list.append(
+        argv.append(
             "--mirror",
         )
     # The multipage option is currently broken:
     # https://gitlab.com/kicad/code/kicad/-/issues/20726
     if multipage:
-        cmd_list.append(
+        argv.append(
             "--mode-multipage",
         )
     else:
-        cmd_list.append(
+        argv.append(
             "--mode-separate",
         )
     if black_and_white:
-        cmd_list.append(
+        argv.append(
             "--black-and-white",
         )
-    cmd = " ".join(cmd_list)
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: PDF export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    _run_kicad(context, argv, error="PDF export from the PCB")
 
 
+@cached_export(inputs=("pcb_path",), outputs=("drill_file_path",))
 def pcb_export_drill(context, pcb_path, drill_file_path):
     """Export drill file from the PCB."""
-    print(f"Exporting drill file from the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "pcb",
-            "export",
-            "drill",
-            f"--output={drill_file_path}",
-            "--drill-origin=plot",
-            "--generate-map",
-            f"{pcb_path}",
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: Drill file export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting drill file from the PCB...")
+    argv = [
+        kicad_cli(),
+        "pcb",
+        "export",
+        "drill",
+        f"--output={drill_file_path}",
+        "--drill-origin=plot",
+        "--generate-map",
+        f"{pcb_path}",
+    ]
+    _run_kicad(context, argv, error="Drill file export from the PCB")
 
 
+@cached_export(inputs=("pcb_path",), outputs=("ipcd356_path",))
 def pcb_export_ipcd356(context, pcb_path, ipcd356_path):
     """Export IPC-D-356 netlist from the PCB."""
-    print(f"Exporting IPC-D-356 netlist from the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "pcb",
-            "export",
-            "ipcd356",
-            f"--output={ipcd356_path}",
-            f"{pcb_path}",
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: IPC-D-356 netlist export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting IPC-D-356 netlist from the PCB...")
+    argv = [
+        kicad_cli(),
+        "pcb",
+        "export",
+        "ipcd356",
+        f"--output={ipcd356_path}",
+        f"{pcb_path}",
+    ]
+    _run_kicad(context, argv, error="IPC-D-356 netlist export from the PCB")
 
 
+@cached_export(inputs=("pcb_path",), outputs=("position_path",))
 def pcb_export_pos(context, pcb_path, position_path):
     """Export position file from the PCB."""
-    print(f"Exporting position file from the PCB...")
-    cmd = " ".join(
-        [
-            KICAD_CLI,
-            "pcb",
-            "export",
-            "pos",
-            f"--output={position_path}",
-            "--use-drill-file-origin",
-            f"{pcb_path}",
-        ]
-    )
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: position file export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    log.info("Exporting position file from the PCB...")
+    argv = [
+        kicad_cli(),
+        "pcb",
+        "export",
+        "pos",
+        f"--output={position_path}",
+        "--use-drill-file-origin",
+        f"{pcb_path}",
+    ]
+    _run_kicad(context, argv, error="position file export from the PCB")
 
 
+@cached_export(inputs=("pcb_path",), outputs=("render_path",))
 def pcb_render(
     context,
     pcb_path,
@@ -579,9 +1173,9 @@ def pcb_render(
     zoom=1,
 ):
     """Generate render from the PCB."""
-    print(f"Generating render from the PCB...")
-    cmd_list = [
-        KICAD_CLI,
+    log.info("Generating render from the PCB...")
+    argv = [
+        kicad_cli(),
         "pcb",
         "render",
         f"--output={render_path}",
@@ -593,26 +1187,20 @@ def pcb_render(
         f"{pcb_path}",
     ]
     if perspective:
-        cmd_list.append(
+        argv.append(
             "--perspective",
         )
-    cmd = " ".join(cmd_list)
-    try:
-        context.run(cmd, echo=True)
-    except UnexpectedExit as e:
-        print(
-            f"\nERROR: IPC-D-356 netlist export from the PCB failed with an unexpected exit code ({e.result.exited})"
-        )
-        raise  # Re-raise the exception so invoke can handle it and exit cleanly
+    _run_kicad(context, argv, error="Render from the PCB")
 
 
 @task(auto_shortflags=False)
 def clean(context, kicad_backups=False, kicad_cache_files=False, all=False):
     """Remove generated files."""
+    _configure_logging()
 
     # Directories
     paths = [
-        f"{OUTPUT_PATH}",
+        f"{get_output_path()}",
     ]
 
     if kicad_backups or all:
@@ -625,106 +1213,194 @@ def clean(context, kicad_backups=False, kicad_cache_files=False, all=False):
             "fp-info-cache",
         ]
 
-    for path in paths:
-        rm(path, recursive=True, force=True)
+    # Directories created earlier in this process may be about to be removed,
+    # along with the export cache
+    global _export_cache
+    _ensured.clear()
+    _export_cache = None
+
+    for path in map(Path, paths):
+        if path.is_dir() and not path.is_symlink():
+            _rmtree_parallel(path)
+        else:
+            rm(path, force=True)
 
 
 @task(auto_shortflags=False)
 def env(context):
     """Print project environment info."""
+    _configure_logging()
     kicad_version(context)
 
 
 @task(auto_shortflags=False)
 def check(context):
     """Run KiCad checks."""
+    _configure_logging()
     schematic_erc(
         context,
         schematic_path=SCH_PATH,
-        report_path=ERC_REPORT_PATH,
+        report_path=get_erc_report_path(),
     )
     pcb_drc(
         context,
         pcb_path=PCB_PATH,
-        report_path=DRC_REPORT_PATH,
+        report_path=get_drc_report_path(),
     )
 
 
 @task(auto_shortflags=False, pre=[env, check])
 def release(context):
     """Generate release files."""
-    schematic_export_pdf(
-        context,
-        schematic_path=SCH_PATH,
-        pdf_path=SCH_PDF_PATH,
-    )
-    schematic_export_svg(
-        context,
-        schematic_path=SCH_PATH,
-        svg_path=SCH_SVG_PATH,
-    )
-    svg_to_png(
-        svg_path=SCH_SVG_PATH / Path(f"{PROJECT_NAME}.svg"),
-        png_path=SCH_PNG_PATH.with_suffix(".png"),
-        dpi=300,
-    )
-    svg_to_png(
-        svg_path=SCH_SVG_PATH / Path(f"{PROJECT_NAME}.svg"),
-        png_path=SCH_PNG_PATH.with_name(f"{SCH_PNG_PATH.stem}_thumbnail.png"),
-        scale=500,
-    )
-    schematic_export_bom(
-        context,
-        schematic_path=SCH_PATH,
-        bom_path=BOM_PATH,
-    )
-    # Currently need to use the built-in layer names:
-    # https://gitlab.com/kicad/code/kicad/-/issues/20904
-    pcb_export_gerbers(
-        context,
-        pcb_path=PCB_PATH,
-        gerbers_path=GERBERS_PATH,
-        layers="F.Cu,B.Cu,F.Paste,B.Paste,F.Silkscreen,B.Silkscreen,F.Mask,B.Mask,User.Drawings,User.Comments,Edge.Cuts,F.Fab,B.Fab,User.1,User.2",
-    )
-    # Currently broken when compression is enabled:
-    # https://gitlab.com/kicad/code/kicad/-/issues/20891
-    # pcb_export_odb(
-    #     context,
-    #     pcb_path=PCB_PATH,
-    #     odb_path=ODB_PATH,
-    # )
-    pcb_export_drill(
-        context,
-        pcb_path=PCB_PATH,
-        drill_file_path=DRILL_FILES_PATH,
-    )
-    pcb_export_ipcd356(
-        context,
-        pcb_path=PCB_PATH,
-        ipcd356_path=IPCD356_PATH,
-    )
-    # Currently need to use the built-in layer names:
-    # https://gitlab.com/kicad/code/kicad/-/issues/20904
-    pcb_export_pdf(
-        context,
-        pcb_path=PCB_PATH,
-        pdf_path=PCB_PDF_PATH,
-        layers="F.Cu,F.Paste,F.Silkscreen,F.Mask,User.Drawings,User.Comments,Edge.Cuts,F.Fab,User.1",
-    )
-    # Currently need to use the built-in layer names:
-    # https://gitlab.com/kicad/code/kicad/-/issues/20904
-    pcb_export_pdf(
-        context,
-        pcb_path=PCB_PATH,
-        pdf_path=PCB_PDF_PATH,
-        layers="B.Cu,B.Paste,B.Silkscreen,B.Mask,B.Fab,User.2",
-        mirror=True,
-    )
-    pcb_export_pos(
-        context,
-        pcb_path=PCB_PATH,
-        position_path=POSITION_PATH,
-    )
+    _configure_logging()
+    # Each export runs an independent kicad-cli process on the same inputs, so
+    # they can all run concurrently. Threads are sufficient here since the
+    # actual work happens in the child processes. The exports are submitted
+    # in order, so the slowest ones go first to keep the pool busy.
+    exports = [
+        # The front and back PCB PDFs each load the whole board, so they are
+        # the slowest exports. They can't be combined into a single kicad-cli
+        # call since --mirror applies to every layer in the call, but running
+        # them in parallel means only one board load is on the critical path.
+        (
+            pcb_export_pdf,
+            dict(
+                pcb_path=PCB_PATH,
+                pdf_path=get_pcb_pdf_path(),
+                layers=PCB_PDF_FRONT_LAYERS,
+            ),
+        ),
+        (
+            pcb_export_pdf,
+            dict(
+                pcb_path=PCB_PATH,
+                pdf_path=get_pcb_pdf_path(),
+                layers=PCB_PDF_BACK_LAYERS,
+                mirror=True,
+            ),
+        ),
+        (
+            schematic_export_pdf,
+            dict(
+                schematic_path=SCH_PATH,
+                pdf_path=get_sch_pdf_path(),
+            ),
+        ),
+        (
+            schematic_export_svg,
+            dict(
+                schematic_path=SCH_PATH,
+                svg_path=get_sch_svg_path(),
+            ),
+        ),
+        (
+            schematic_export_bom,
+            dict(
+                schematic_path=SCH_PATH,
+                bom_path=get_bom_path(),
+            ),
+        ),
+        (
+            export_zipped,
+            dict(
+                export=pcb_export_gerbers,
+                zip_path=get_gerbers_path().with_suffix(".zip"),
+                output_arg="gerbers_path",
+                pcb_path=PCB_PATH,
+                layers=GERBER_LAYERS,
+            ),
+        ),
+        # Currently broken when compression is enabled:
+        # https://gitlab.com/kicad/code/kicad/-/issues/20891
+        #
+        # archive_format leaves kicad-cli's compression disabled and
+        # compresses the export with parallel_archive() instead.
+        # (
+        #     pcb_export_odb,
+        #     dict(
+        #         pcb_path=PCB_PATH,
+        #         odb_path=get_odb_path().with_suffix(".tgz"),
+        #         archive_format="tgz",
+        #     ),
+        # ),
+        (
+            export_zipped,
+            dict(
+                export=pcb_export_drill,
+                zip_path=get_drill_files_path().with_suffix(".zip"),
+                output_arg="drill_file_path",
+                pcb_path=PCB_PATH,
+            ),
+        ),
+        (
+            pcb_export_ipcd356,
+            dict(
+                pcb_path=PCB_PATH,
+                ipcd356_path=get_ipcd356_path(),
+            ),
+        ),
+        (
+            pcb_export_pos,
+            dict(
+                pcb_path=PCB_PATH,
+                position_path=get_position_path(),
+            ),
+        ),
+    ]
+
+    # The PNG conversions depend on the schematic SVG, so they are submitted
+    # as a second stage once the SVG export has completed.
+    dependents = {
+        schematic_export_svg: [
+            (
+                svg_to_pngs,
+                dict(
+                    svg_path=get_sch_svg_path() / Path(f"{PROJECT_NAME}.svg"),
+                    outputs=[
+                        dict(
+                            png_path=get_sch_png_path().with_suffix(".png"),
+                            dpi=300,
+                            grayscale=True,
+                        ),
+                        dict(
+                            png_path=get_sch_png_path().with_name(
+                                f"{get_sch_png_path().stem}_thumbnail.png"
+                            ),
+                            scale=500,
+                            grayscale=True,
+                        ),
+                    ],
+                ),
+            ),
+        ],
+    }
+
+    max_workers = min(os.cpu_count() or 1, len(exports))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {
+            executor.submit(func, context, **kwargs): func
+            for func, kwargs in exports
+        }
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    func = pending.pop(future)
+                    # Re-raises any Exit from a failed export
+                    future.result()
+                    # The dependents need the real export outputs
+                    if context.config.run.dry:
+                        continue
+                    for dependent, kwargs in dependents.get(func, []):
+                        pending[executor.submit(dependent, **kwargs)] = (
+                            dependent
+                        )
+        except BaseException:
+            # Don't start any queued exports after a failure
+            for future in pending:
+                future.cancel()
+            raise
+
     # There are a few issues with the KiCad CLI render command that need to be
     # resolved before this can be enabled. For example, it's not possible to
     # customize the layers that are rendered and it's not possible to use a
@@ -735,7 +1411,7 @@ def release(context):
     # pcb_render(
     #     context,
     #     pcb_path=PCB_PATH,
-    #     render_path=PCA_RENDER_PATH
+    #     render_path=get_pca_render_path()
     #     / Path(
     #         f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}_top_ortho.png"
     #     ),
@@ -748,7 +1424,7 @@ def release(context):
     # pcb_render(
     #     context,
     #     pcb_path=PCB_PATH,
-    #     render_path=PCA_RENDER_PATH
+    #     render_path=get_pca_render_path()
     #     / Path(
     #         f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}_bottom_ortho.png"
     #     ),
@@ -761,7 +1437,7 @@ def release(context):
     # pcb_render(
     #     context,
     #     pcb_path=PCB_PATH,
-    #     render_path=PCA_RENDER_PATH
+    #     render_path=get_pca_render_path()
     #     / Path(
     #         f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}_top.png"
     #     ),
@@ -774,7 +1450,7 @@ def release(context):
     # pcb_render(
     #     context,
     #     pcb_path=PCB_PATH,
-    #     render_path=PCA_RENDER_PATH
+    #     render_path=get_pca_render_path()
     #     / Path(
     #         f"{PROJECT_NAME}_v{PROJECT_VERSION_MAJOR}_PCA_{PCA_PART_NUMBER}_Rev_{PCA_REV}_bottom.png"
     #     ),